@@ -5,7 +5,7 @@ import os
 import threading
 import uuid
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
 
 from browser_use.browser.browser import BrowserConfig
 from langchain_community.tools.file_management import (
@@ -45,6 +45,134 @@ SEARCH_INFO_FILENAME = "search_info.json"
 
 _AGENT_STOP_FLAGS = {}
 _BROWSER_AGENT_INSTANCES = {}
+_SHARED_BROWSERS: Dict[str, CustomBrowser] = {}
+# Idle browser kept open between runs (keep_browser_open), with the key of its launch settings
+_KEPT_BROWSER: Optional[Tuple[str, CustomBrowser]] = None
+_SHARED_BROWSER_LOCK = asyncio.Lock()
+
+
+def _browser_config_key(browser_config: Dict[str, Any]) -> str:
+    """Key of the launch settings in a browser config; runs with equal keys can reuse a kept browser."""
+    return json.dumps(
+        {k: v for k, v in browser_config.items() if k != "keep_browser_open"},
+        sort_keys=True,
+        default=str,
+    )
+
+
+def _create_browser(browser_config: Dict[str, Any]) -> CustomBrowser:
+    """Builds a CustomBrowser from the research browser config dict."""
+    headless = browser_config.get("headless", False)
+    window_w = browser_config.get("window_width", 1280)
+    window_h = browser_config.get("window_height", 1100)
+    browser_user_data_dir = browser_config.get("user_data_dir", None)
+    use_own_browser = browser_config.get("use_own_browser", False)
+    browser_binary_path = browser_config.get("browser_binary_path", None)
+    wss_url = browser_config.get("wss_url", None)
+    cdp_url = browser_config.get("cdp_url", None)
+
+    extra_args = []
+    if use_own_browser:
+        browser_binary_path = os.getenv("BROWSER_PATH", None) or browser_binary_path
+        if browser_binary_path == "":
+            browser_binary_path = None
+        browser_user_data = browser_user_data_dir or os.getenv("BROWSER_USER_DATA", None)
+        if browser_user_data:
+            extra_args += [f"--user-data-dir={browser_user_data}"]
+    else:
+        browser_binary_path = None
+
+    return CustomBrowser(
+        config=BrowserConfig(
+            headless=headless,
+            browser_binary_path=browser_binary_path,
+            extra_browser_args=extra_args,
+            wss_url=wss_url,
+            cdp_url=cdp_url,
+            new_context_config=BrowserContextConfig(
+                window_width=window_w,
+                window_height=window_h,
+            )
+        )
+    )
+
+
+def _is_browser_alive(browser: CustomBrowser) -> bool:
+    """Whether the underlying playwright browser is still launched and connected."""
+    playwright_browser = getattr(browser, "playwright_browser", None)
+    return playwright_browser is not None and playwright_browser.is_connected()
+
+
+async def _get_shared_browser(task_id: str, browser_config: Dict[str, Any]) -> CustomBrowser:
+    """
+    Returns the browser shared by all browser tasks of a research run, launching it on first use.
+    Launching Chrome is the slowest part of a browser task, so parallel queries only open new contexts.
+    """
+    global _KEPT_BROWSER
+    async with _SHARED_BROWSER_LOCK:
+        browser = _SHARED_BROWSERS.get(task_id)
+        if browser is None:
+            if _KEPT_BROWSER is not None:
+                kept_key, kept_browser = _KEPT_BROWSER
+                _KEPT_BROWSER = None
+                if kept_key != _browser_config_key(browser_config):
+                    # Kept with other launch settings, so it is stale now
+                    await _close_browser(kept_browser)
+                elif not _is_browser_alive(kept_browser):
+                    # The user closed the window or Chrome crashed since the last run
+                    logger.info("Kept browser is disconnected, launching a new one.")
+                    await _close_browser(kept_browser)
+                else:
+                    logger.info(f"Reusing kept browser for research task {task_id}")
+                    browser = kept_browser
+            if browser is None:
+                logger.info(f"Launching shared browser for research task {task_id}")
+                browser = _create_browser(browser_config)
+                # Launch while holding the lock so concurrent tasks don't each start a browser
+                try:
+                    await browser.get_playwright_browser()
+                except Exception:
+                    # Playwright is started before Chrome; don't leak its driver on a failed launch
+                    await _close_browser(browser)
+                    raise
+            _SHARED_BROWSERS[task_id] = browser
+        return browser
+
+
+async def _close_browser(browser: CustomBrowser):
+    """Closes a browser, logging instead of raising on failure."""
+    try:
+        await browser.close()
+    except Exception as e:
+        logger.error(f"Error closing shared browser: {e}")
+
+
+async def _close_shared_browser(task_id: str, browser_config: Dict[str, Any]):
+    """
+    Releases the shared browser of a research run, if one was launched.
+    With keep_browser_open it stays open for the next run with the same launch settings.
+    """
+    global _KEPT_BROWSER
+    browser = _SHARED_BROWSERS.pop(task_id, None)
+    if not browser:
+        return
+    if browser_config.get("keep_browser_open", False):
+        async with _SHARED_BROWSER_LOCK:
+            if _KEPT_BROWSER is None:
+                _KEPT_BROWSER = (_browser_config_key(browser_config), browser)
+                logger.info(f"Keeping shared browser of research task {task_id} open.")
+                return
+    await _close_browser(browser)
+    logger.info(f"Closed shared browser for research task {task_id}.")
+
+
+async def close_kept_browser():
+    """Closes the browser kept open between research runs, e.g. when the browser settings change."""
+    global _KEPT_BROWSER
+    async with _SHARED_BROWSER_LOCK:
+        if _KEPT_BROWSER is not None:
+            await _close_browser(_KEPT_BROWSER[1])
+            _KEPT_BROWSER = None
 
 
 async def run_single_browser_task(
@@ -57,7 +185,7 @@ async def run_single_browser_task(
 ) -> Dict[str, Any]:
     """
     Runs a single BrowserUseAgent task.
-    Manages browser creation and closing for this specific task.
+    Uses its own context on the research run's shared browser and closes the context when done.
     """
     if not BrowserUseAgent:
         return {
@@ -66,45 +194,13 @@ async def run_single_browser_task(
         }
 
     # --- Browser Setup ---
-    # These should ideally come from the main agent's config
-    headless = browser_config.get("headless", False)
     window_w = browser_config.get("window_width", 1280)
     window_h = browser_config.get("window_height", 1100)
-    browser_user_data_dir = browser_config.get("user_data_dir", None)
-    use_own_browser = browser_config.get("use_own_browser", False)
-    browser_binary_path = browser_config.get("browser_binary_path", None)
-    wss_url = browser_config.get("wss_url", None)
-    cdp_url = browser_config.get("cdp_url", None)
-    disable_security = browser_config.get("disable_security", False)
 
-    bu_browser = None
     bu_browser_context = None
     try:
         logger.info(f"Starting browser task for query: {task_query}")
-        extra_args = []
-        if use_own_browser:
-            browser_binary_path = os.getenv("BROWSER_PATH", None) or browser_binary_path
-            if browser_binary_path == "":
-                browser_binary_path = None
-            browser_user_data = browser_user_data_dir or os.getenv("BROWSER_USER_DATA", None)
-            if browser_user_data:
-                extra_args += [f"--user-data-dir={browser_user_data}"]
-        else:
-            browser_binary_path = None
-
-        bu_browser = CustomBrowser(
-            config=BrowserConfig(
-                headless=headless,
-                browser_binary_path=browser_binary_path,
-                extra_browser_args=extra_args,
-                wss_url=wss_url,
-                cdp_url=cdp_url,
-                new_context_config=BrowserContextConfig(
-                    window_width=window_w,
-                    window_height=window_h,
-                )
-            )
-        )
+        bu_browser = await _get_shared_browser(task_id, browser_config)
 
         context_config = BrowserContextConfig(
             save_downloads_path="./tmp/downloads",
@@ -181,13 +277,6 @@ async def run_single_browser_task(
                 logger.info("Closed browser context.")
             except Exception as e:
                 logger.error(f"Error closing browser context: {e}")
-        if bu_browser:
-            try:
-                await bu_browser.close()
-                bu_browser = None
-                logger.info("Closed browser.")
-            except Exception as e:
-                logger.error(f"Error closing browser: {e}")
 
         if task_key in _BROWSER_AGENT_INSTANCES:
             del _BROWSER_AGENT_INSTANCES[task_key]
@@ -362,8 +451,7 @@ def _load_previous_state(task_id: str, output_dir: str) -> Dict[str, Any]:
                                 task_counter_in_cat = 0
                         category_name = line[line.find(" "):].strip()  # Get text after "## X. "
                         current_category = ResearchCategoryItem(category_name=category_name, tasks=[])
-                    elif (line.startswith("- [ ]") or line.startswith("- [x]") or line.startswith(
-                            "- [-]")) and current_category:  # Task
+                    elif line.startswith(("- [ ]", "- [x]", "- [-]")) and current_category:  # Task
                         status = "pending"
                         if line.startswith("- [x]"):
                             status = "completed"
@@ -420,8 +508,11 @@ def _load_previous_state(task_id: str, output_dir: str) -> Dict[str, Any]:
 
 def _save_plan_to_md(plan: List[ResearchCategoryItem], output_dir: str):
     plan_file = os.path.join(output_dir, PLAN_FILENAME)
+    # Write to a temp file and rename it into place: the UI polls this file and
+    # resume reads it, so neither may see a half-written plan.
+    tmp_file = f"{plan_file}.tmp"
     try:
-        with open(plan_file, "w", encoding="utf-8") as f:
+        with open(tmp_file, "w", encoding="utf-8") as f:
             f.write(f"# Research Plan\n\n")
             for cat_idx, category in enumerate(plan):
                 f.write(f"## {cat_idx + 1}. {category['category_name']}\n\n")
@@ -430,6 +521,7 @@ def _save_plan_to_md(plan: List[ResearchCategoryItem], output_dir: str):
                                                                                           "status"] == "pending" else "- [-]"  # [-] for failed
                     f.write(f"  {marker} {task['task_description']}\n")
                 f.write("\n")
+        os.replace(tmp_file, plan_file)
         logger.info(f"Hierarchical research plan saved to {plan_file}")
     except Exception as e:
         logger.error(f"Failed to save research plan to {plan_file}: {e}")
@@ -439,9 +531,11 @@ def _save_search_results_to_json(results: List[Dict[str, Any]], output_dir: str)
     """Appends or overwrites search results to a JSON file."""
     search_file = os.path.join(output_dir, SEARCH_INFO_FILENAME)
     try:
-        # Simple overwrite for now, could be append
-        with open(search_file, "w", encoding="utf-8") as f:
+        # Simple overwrite for now, could be append; temp file + rename keeps resume data intact
+        tmp_file = f"{search_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
             json.dump(results, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, search_file)
         logger.info(f"Search results saved to {search_file}")
     except Exception as e:
         logger.error(f"Failed to save search results to {search_file}: {e}")
@@ -472,7 +566,7 @@ async def planning_node(state: DeepResearchState) -> Dict[str, Any]:
     if existing_plan and (
             state.get("current_category_index", 0) > 0 or state.get("current_task_index_in_category", 0) > 0):
         logger.info("Resuming with existing plan.")
-        _save_plan_to_md(existing_plan, output_dir)  # Ensure it's saved initially
+        await asyncio.to_thread(_save_plan_to_md, existing_plan, output_dir)  # Ensure it's saved initially
         # current_category_index and current_task_index_in_category should be set by _load_previous_state
         return {"research_plan": existing_plan}
 
@@ -526,12 +620,12 @@ Ensure the output is a valid JSON array.
 
     try:
         response = await llm.ainvoke(messages)
-        raw_content = response.content
+        raw_content = response.content.strip()
         # The LLM might wrap the JSON in backticks
-        if raw_content.strip().startswith("```json"):
-            raw_content = raw_content.strip()[7:-3].strip()
-        elif raw_content.strip().startswith("```"):
-            raw_content = raw_content.strip()[3:-3].strip()
+        if raw_content.startswith("```json"):
+            raw_content = raw_content[7:-3].strip()
+        elif raw_content.startswith("```"):
+            raw_content = raw_content[3:-3].strip()
 
         logger.debug(f"LLM response for plan: {raw_content}")
         parsed_plan_from_llm = json.loads(raw_content)
@@ -589,7 +683,7 @@ Ensure the output is a valid JSON array.
             return {"error_message": "Failed to generate research plan structure."}
 
         logger.info(f"Generated research plan with {len(new_plan)} categories.")
-        _save_plan_to_md(new_plan, output_dir)  # Save the hierarchical plan
+        await asyncio.to_thread(_save_plan_to_md, new_plan, output_dir)  # Save the hierarchical plan
 
         return {
             "research_plan": new_plan,
@@ -688,6 +782,7 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
         logger.info("LLM invocation complete.")
 
         tool_results = []
+        tool_errors = []  # Recorded as they happen, so results need no second scan
         executed_tool_names = []
         current_search_results = state.get("search_results", [])  # Get existing search results
 
@@ -703,6 +798,7 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
             # We still save the plan and advance.
         else:
             # Process tool calls
+            tools_by_name = {t.name: t for t in tools}
             for tool_call in ai_response.tool_calls:
                 tool_name = tool_call.get("name")
                 tool_args = tool_call.get("args", {})
@@ -710,12 +806,13 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
 
                 logger.info(f"LLM requested tool call: {tool_name} with args: {tool_args}")
                 executed_tool_names.append(tool_name)
-                selected_tool = next((t for t in tools if t.name == tool_name), None)
+                selected_tool = tools_by_name.get(tool_name)
 
                 if not selected_tool:
                     logger.error(f"LLM called tool '{tool_name}' which is not available.")
-                    tool_results.append(
-                        ToolMessage(content=f"Error: Tool '{tool_name}' not found.", tool_call_id=tool_call_id))
+                    error_content = f"Error: Tool '{tool_name}' not found."
+                    tool_errors.append(error_content)
+                    tool_results.append(ToolMessage(content=error_content, tool_call_id=tool_call_id))
                     continue
 
                 try:
@@ -723,7 +820,7 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                     if stop_event and stop_event.is_set():
                         logger.info(f"Stop requested before executing tool: {tool_name}")
                         current_task["status"] = "pending"  # Or a new "stopped" status
-                        _save_plan_to_md(plan, output_dir)
+                        await asyncio.to_thread(_save_plan_to_md, plan, output_dir)
                         return {"stop_requested": True, "research_plan": plan, "current_category_index": cat_idx,
                                 "current_task_index_in_category": task_idx}
 
@@ -740,25 +837,27 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                             {"tool_name": tool_name, "args": tool_args, "output": str(tool_output),
                              "status": "completed"})
 
-                    tool_results.append(ToolMessage(content=json.dumps(tool_output), tool_call_id=tool_call_id))
+                    # Compact separators: this string goes straight back into the LLM context
+                    tool_results.append(
+                        ToolMessage(content=json.dumps(tool_output, separators=(",", ":")), tool_call_id=tool_call_id))
 
                 except Exception as e:
                     logger.error(f"Error executing tool '{tool_name}': {e}", exc_info=True)
-                    tool_results.append(
-                        ToolMessage(content=f"Error executing tool {tool_name}: {e}", tool_call_id=tool_call_id))
+                    error_content = f"Error executing tool {tool_name}: {e}"
+                    tool_errors.append(error_content)
+                    tool_results.append(ToolMessage(content=error_content, tool_call_id=tool_call_id))
                     current_search_results.append(
                         {"tool_name": tool_name, "args": tool_args, "status": "failed", "error": str(e)})
 
             # After processing all tool calls for this task
-            step_failed_tool_execution = any("Error:" in str(tr.content) for tr in tool_results)
+            step_failed_tool_execution = bool(tool_errors)
             # Consider a task successful if a browser search was attempted and didn't immediately error out during call
             # The browser search itself returns status for each query.
             browser_tool_attempted_successfully = "parallel_browser_search" in executed_tool_names and not step_failed_tool_execution
 
             if step_failed_tool_execution:
                 current_task["status"] = "failed"
-                current_task[
-                    "result_summary"] = f"Tool execution failed. Errors: {[tr.content for tr in tool_results if 'Error' in str(tr.content)]}"
+                current_task["result_summary"] = f"Tool execution failed. Errors: {tool_errors}"
             elif executed_tool_names:  # If any tool was called
                 current_task["status"] = "completed"
                 current_task["result_summary"] = f"Executed tool(s): {', '.join(executed_tool_names)}."
@@ -768,8 +867,8 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                 current_task["result_summary"] = "LLM prepared for tool call but provided no tools."
 
         # Save progress
-        _save_plan_to_md(plan, output_dir)
-        _save_search_results_to_json(current_search_results, output_dir)
+        await asyncio.to_thread(_save_plan_to_md, plan, output_dir)
+        await asyncio.to_thread(_save_search_results_to_json, current_search_results, output_dir)
 
         # Determine next indices
         next_task_idx = task_idx + 1
@@ -792,7 +891,7 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
         logger.error(f"Unhandled error during research execution for task '{current_task['task_description']}': {e}",
                      exc_info=True)
         current_task["status"] = "failed"
-        _save_plan_to_md(plan, output_dir)
+        await asyncio.to_thread(_save_plan_to_md, plan, output_dir)
         # Determine next indices even on error to attempt to move on
         next_task_idx = task_idx + 1
         next_cat_idx = cat_idx
@@ -824,7 +923,7 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
     if not search_results:
         logger.warning("No search results found to synthesize report.")
         report = f"# Research Report: {topic}\n\nNo information was gathered during the research process."
-        _save_report_to_md(report, output_dir)
+        await asyncio.to_thread(_save_report_to_md, report, output_dir)
         return {"final_report": report}
 
     logger.info(
@@ -833,7 +932,8 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
 
     # Prepare context for the LLM
     # Format search results nicely, maybe group by query or original plan step
-    formatted_results = ""
+    # Collect parts and join once instead of growing the string with +=
+    formatted_parts = []
     references = {}
     ref_count = 1
     for i, result_entry in enumerate(search_results):
@@ -845,29 +945,31 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
 
         if tool_name == "parallel_browser_search" and status == "completed" and result_data:
             # result_data is the summary from BrowserUseAgent
-            formatted_results += f'### Finding from Web Search Query: "{query}"\n'
-            formatted_results += f"- **Summary:**\n{result_data}\n"  # result_data is already a summary string here
+            formatted_parts.append(f'### Finding from Web Search Query: "{query}"\n')
+            formatted_parts.append(f"- **Summary:**\n{result_data}\n")  # result_data is already a summary string here
             # If result_data contained title/URL, you'd format them here.
             # The current BrowserUseAgent returns a string summary directly as 'final_data' in run_single_browser_task
-            formatted_results += "---\n"
+            formatted_parts.append("---\n")
         elif tool_name != "parallel_browser_search" and status == "completed" and tool_output_str:
-            formatted_results += f'### Finding from Tool: "{tool_name}" (Args: {result_entry.get("args")})\n'
-            formatted_results += f"- **Output:**\n{tool_output_str}\n"
-            formatted_results += "---\n"
+            formatted_parts.append(f'### Finding from Tool: "{tool_name}" (Args: {result_entry.get("args")})\n')
+            formatted_parts.append(f"- **Output:**\n{tool_output_str}\n")
+            formatted_parts.append("---\n")
         elif status == "failed":
             error = result_entry.get("error")
             q_or_t = f"Query: \"{query}\"" if query != "Unknown Query" else f"Tool: \"{tool_name}\""
-            formatted_results += f'### Failed {q_or_t}\n'
-            formatted_results += f"- **Error:** {error}\n"
-            formatted_results += "---\n"
+            formatted_parts.append(f'### Failed {q_or_t}\n')
+            formatted_parts.append(f"- **Error:** {error}\n")
+            formatted_parts.append("---\n")
+    formatted_results = "".join(formatted_parts)
 
     # Prepare the research plan context
-    plan_summary = "\nResearch Plan Followed:\n"
+    plan_parts = ["\nResearch Plan Followed:\n"]
     for cat_idx, category in enumerate(plan):
-        plan_summary += f"\n#### Category {cat_idx + 1}: {category['category_name']}\n"
+        plan_parts.append(f"\n#### Category {cat_idx + 1}: {category['category_name']}\n")
         for task_idx, task in enumerate(category['tasks']):
             marker = "[x]" if task["status"] == "completed" else "[ ]" if task["status"] == "pending" else "[-]"
-            plan_summary += f"  - {marker} {task['task_description']}\n"
+            plan_parts.append(f"  - {marker} {task['task_description']}\n")
+    plan_summary = "".join(plan_parts)
 
     synthesis_prompt = ChatPromptTemplate.from_messages(
         [
@@ -924,7 +1026,7 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
             final_report_md += report_references_section
 
         logger.info("Successfully synthesized the final report.")
-        _save_report_to_md(final_report_md, output_dir)
+        await asyncio.to_thread(_save_report_to_md, final_report_md, output_dir)
         return {"final_report": final_report_md}
 
     except Exception as e:
@@ -1111,11 +1213,12 @@ class DeepResearchAgent:
             }
 
         self.current_task_id = task_id if task_id else str(uuid.uuid4())
-        safe_root_dir = "./tmp/deep_research"
-        normalized_save_dir = os.path.normpath(save_dir)
-        if not normalized_save_dir.startswith(os.path.abspath(safe_root_dir)):
+        safe_root_dir = os.path.abspath("./tmp/deep_research")
+        normalized_save_dir = os.path.abspath(os.path.normpath(save_dir))
+        # Path-component check: a plain prefix test would accept siblings like "deep_research2"
+        if os.path.commonpath([normalized_save_dir, safe_root_dir]) != safe_root_dir:
             logger.warning(f"Unsafe save_dir detected: {save_dir}. Using default directory.")
-            normalized_save_dir = os.path.abspath(safe_root_dir)
+            normalized_save_dir = safe_root_dir
         output_dir = os.path.join(normalized_save_dir, self.current_task_id)
         os.makedirs(output_dir, exist_ok=True)
 
@@ -1148,7 +1251,7 @@ class DeepResearchAgent:
 
         if task_id:
             logger.info(f"Attempting to resume task {task_id}...")
-            loaded_state = _load_previous_state(task_id, output_dir)
+            loaded_state = await asyncio.to_thread(_load_previous_state, task_id, output_dir)
             initial_state.update(loaded_state)
             if loaded_state.get("research_plan"):
                 logger.info(
@@ -1206,6 +1309,8 @@ class DeepResearchAgent:
         finally:
             logger.info(f"Cleaning up resources for task {self.current_task_id}")
             task_id_to_clean = self.current_task_id
+            _AGENT_STOP_FLAGS.pop(task_id_to_clean, None)
+            await _close_shared_browser(task_id_to_clean, self.browser_config)
 
             self.stop_event = None
             self.current_task_id = None
@@ -1,4 +1,5 @@
 import inspect
+import json
 import logging
 import uuid
 from datetime import date, datetime, time
@@ -13,6 +14,43 @@ from pydantic.v1 import BaseModel, Field
 
 logger = logging.getLogger(__name__)
 
+# Basic JSON schema type mapping
+_TYPE_MAPPING = {
+    'string': str,
+    'integer': int,
+    'number': float,
+    'boolean': bool,
+    'array': List,
+    'object': Dict,
+    'null': type(None),
+}
+
+# JSON schema string formats
+_FORMAT_MAPPING = {
+    'date-time': datetime,
+    'date': date,
+    'time': time,
+    'email': str,
+    'uri': str,
+    'url': str,
+    'uuid': uuid.UUID,
+    'binary': bytes,
+}
+
+
+def parse_mcp_server_config(text: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Parses the MCP server config JSON entered in the UI.
+    Returns None for empty input and raises ValueError if it is not a JSON object.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    mcp_server_config = json.loads(text)
+    if not isinstance(mcp_server_config, dict):
+        raise ValueError("expected a JSON object")
+    return mcp_server_config
+
 
 async def setup_mcp_client_and_tools(mcp_server_config: Dict[str, Any]) -> Optional[MultiServerMCPClient]:
     """
@@ -139,30 +177,9 @@ def resolve_type(prop_details: Dict[str, Any], prefix: str = "") -> Any:
         # In a real application, reference resolution would be needed
         return Any
 
-    # Basic type mapping
-    type_mapping = {
-        'string': str,
-        'integer': int,
-        'number': float,
-        'boolean': bool,
-        'array': List,
-        'object': Dict,
-        'null': type(None),
-    }
-
     # Handle formatted strings
     if prop_details.get('type') == 'string' and 'format' in prop_details:
-        format_mapping = {
-            'date-time': datetime,
-            'date': date,
-            'time': time,
-            'email': str,
-            'uri': str,
-            'url': str,
-            'uuid': uuid.UUID,
-            'binary': bytes,
-        }
-        return format_mapping.get(prop_details['format'], str)
+        return _FORMAT_MAPPING.get(prop_details['format'], str)
 
     # Handle enum types
     if 'enum' in prop_details:
@@ -245,10 +262,10 @@ def resolve_type(prop_details: Dict[str, Any], prefix: str = "") -> Any:
         # Handle multiple types (e.g., ["string", "null"])
         non_null_types = [t for t in schema_type if t != 'null']
         if non_null_types:
-            primary_type = type_mapping.get(non_null_types[0], Any)
+            primary_type = _TYPE_MAPPING.get(non_null_types[0], Any)
             if 'null' in schema_type:
                 return Optional[primary_type]  # type: ignore
             return primary_type
         return Any
 
-    return type_mapping.get(schema_type, Any)
+    return _TYPE_MAPPING.get(schema_type, Any)
@@ -1,4 +1,5 @@
 import base64
+import logging
 import os
 import time
 from pathlib import Path
@@ -8,6 +9,8 @@ import json
 import gradio as gr
 import uuid
 
+logger = logging.getLogger(__name__)
+
 
 def encode_image(img_path):
     if not img_path:
@@ -34,6 +37,6 @@ def get_latest_files(directory: str, file_types: list = ['.webm', '.zip']) -> Di
                 if time.time() - latest.stat().st_mtime > 1.0:
                     latest_files[file_type] = str(latest)
         except Exception as e:
-            print(f"Error getting latest {file_type} file: {e}")
+            logger.error(f"Error getting latest {file_type} file: {e}")
 
     return latest_files
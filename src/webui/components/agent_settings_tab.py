@@ -24,6 +24,13 @@ def update_model_dropdown(llm_provider):
         return gr.Dropdown(choices=[], value="", interactive=True, allow_custom_value=True)
 
 
+def update_provider_settings(llm_provider):
+    """
+    Update the model dropdown and the ollama context length visibility for the selected provider.
+    """
+    return update_model_dropdown(llm_provider), gr.update(visible=llm_provider == "ollama")
+
+
 async def update_mcp_server(mcp_file: str, webui_manager: WebuiManager):
     """
     Update the MCP server.
@@ -47,8 +54,11 @@ def create_agent_settings_tab(webui_manager: WebuiManager):
     """
     Creates an agent settings tab.
     """
-    input_components = set(webui_manager.get_components())
     tab_components = {}
+    # Same provider list for both the main and planner dropdowns
+    provider_choices = list(config.model_names.keys())
+    default_llm = os.getenv("DEFAULT_LLM", "openai")
+    default_llm_models = config.model_names[default_llm]
 
     with gr.Group():
         with gr.Column():
@@ -62,16 +72,16 @@ def create_agent_settings_tab(webui_manager: WebuiManager):
     with gr.Group():
         with gr.Row():
             llm_provider = gr.Dropdown(
-                choices=[provider for provider, model in config.model_names.items()],
+                choices=provider_choices,
                 label="LLM Provider",
-                value=os.getenv("DEFAULT_LLM", "openai"),
+                value=default_llm,
                 info="Select LLM provider for LLM",
                 interactive=True
             )
             llm_model_name = gr.Dropdown(
                 label="LLM Model Name",
-                choices=config.model_names[os.getenv("DEFAULT_LLM", "openai")],
-                value=config.model_names[os.getenv("DEFAULT_LLM", "openai")][0],
+                choices=default_llm_models,
+                value=default_llm_models[0],
                 interactive=True,
                 allow_custom_value=True,
                 info="Select a model in the dropdown options or directly type a custom model name"
@@ -121,7 +131,7 @@ def create_agent_settings_tab(webui_manager: WebuiManager):
     with gr.Group():
         with gr.Row():
             planner_llm_provider = gr.Dropdown(
-                choices=[provider for provider, model in config.model_names.items()],
+                choices=provider_choices,
                 label="Planner LLM Provider",
                 info="Select LLM provider for LLM",
                 value=None,
@@ -236,25 +246,18 @@ def create_agent_settings_tab(webui_manager: WebuiManager):
     ))
     webui_manager.add_components("agent_settings", tab_components)
 
+    # Provider changes only touch the UI, so they skip the queue and respond immediately
     llm_provider.change(
-        fn=lambda x: gr.update(visible=x == "ollama"),
-        inputs=llm_provider,
-        outputs=ollama_num_ctx
-    )
-    llm_provider.change(
-        lambda provider: update_model_dropdown(provider),
+        update_provider_settings,
         inputs=[llm_provider],
-        outputs=[llm_model_name]
-    )
-    planner_llm_provider.change(
-        fn=lambda x: gr.update(visible=x == "ollama"),
-        inputs=[planner_llm_provider],
-        outputs=[planner_ollama_num_ctx]
+        outputs=[llm_model_name, ollama_num_ctx],
+        queue=False
     )
     planner_llm_provider.change(
-        lambda provider: update_model_dropdown(provider),
+        update_provider_settings,
         inputs=[planner_llm_provider],
-        outputs=[planner_llm_model_name]
+        outputs=[planner_llm_model_name, planner_ollama_num_ctx],
+        queue=False
     )
 
     async def update_wrapper(mcp_file):
@@ -1,5 +1,4 @@
 import os
-from distutils.util import strtobool
 import gradio as gr
 import logging
 from gradio.components import Component
@@ -9,6 +8,12 @@ from src.utils import config
 
 logger = logging.getLogger(__name__)
 
+
+def _env_flag(name: str, default: str) -> bool:
+    """Reads a boolean environment flag, accepting the same true values as distutils' strtobool."""
+    return os.getenv(name, default).strip().lower() in ("y", "yes", "t", "true", "on", "1")
+
+
 async def close_browser(webui_manager: WebuiManager):
     """
     Close browser
@@ -27,11 +32,16 @@ async def close_browser(webui_manager: WebuiManager):
         await webui_manager.bu_browser.close()
         webui_manager.bu_browser = None
 
+    if getattr(webui_manager, "dr_agent", None):
+        # Only reachable once deep research has run, so the import is already loaded.
+        # The next research run relaunches with the new settings (its browser_config is refreshed per run).
+        from src.agent.deep_research.deep_research_agent import close_kept_browser
+        await close_kept_browser()
+
 def create_browser_settings_tab(webui_manager: WebuiManager):
     """
     Creates a browser settings tab.
     """
-    input_components = set(webui_manager.get_components())
     tab_components = {}
 
     with gr.Group():
@@ -52,13 +62,13 @@ def create_browser_settings_tab(webui_manager: WebuiManager):
         with gr.Row():
             use_own_browser = gr.Checkbox(
                 label="Use Own Browser",
-                value=bool(strtobool(os.getenv("USE_OWN_BROWSER", "false"))),
+                value=_env_flag("USE_OWN_BROWSER", "false"),
                 info="Use your existing browser instance",
                 interactive=True
             )
             keep_browser_open = gr.Checkbox(
                 label="Keep Browser Open",
-                value=bool(strtobool(os.getenv("KEEP_BROWSER_OPEN", "true"))),
+                value=_env_flag("KEEP_BROWSER_OPEN", "true"),
                 info="Keep Browser Open between Tasks",
                 interactive=True
             )
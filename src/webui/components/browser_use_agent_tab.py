@@ -16,12 +16,12 @@ from browser_use.browser.browser import BrowserConfig
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
 from browser_use.browser.views import BrowserState
 from gradio.components import Component
-from langchain_core.language_models.chat_models import BaseChatModel
 
 from src.agent.browser_use.browser_use_agent import BrowserUseAgent
 from src.browser.custom_browser import CustomBrowser
 from src.controller.custom_controller import CustomController
 from src.utils import llm_provider
+from src.utils.mcp_client import parse_mcp_server_config
 from src.webui.webui_manager import WebuiManager
 
 logger = logging.getLogger(__name__)
@@ -30,71 +30,6 @@ logger = logging.getLogger(__name__)
 # --- Helper Functions --- (Defined at module level)
 
 
-async def _initialize_llm(
-        provider: Optional[str],
-        model_name: Optional[str],
-        temperature: float,
-        base_url: Optional[str],
-        api_key: Optional[str],
-        num_ctx: Optional[int] = None,
-) -> Optional[BaseChatModel]:
-    """Initializes the LLM based on settings. Returns None if provider/model is missing."""
-    if not provider or not model_name:
-        logger.info("LLM Provider or Model Name not specified, LLM will be None.")
-        return None
-    try:
-        # Use your actual LLM provider logic here
-        logger.info(
-            f"Initializing LLM: Provider={provider}, Model={model_name}, Temp={temperature}"
-        )
-        # Example using a placeholder function
-        llm = llm_provider.get_llm_model(
-            provider=provider,
-            model_name=model_name,
-            temperature=temperature,
-            base_url=base_url or None,
-            api_key=api_key or None,
-            # Add other relevant params like num_ctx for ollama
-            num_ctx=num_ctx if provider == "ollama" else None,
-        )
-        return llm
-    except Exception as e:
-        logger.error(f"Failed to initialize LLM: {e}", exc_info=True)
-        gr.Warning(
-            f"Failed to initialize LLM '{model_name}' for provider '{provider}'. Please check settings. Error: {e}"
-        )
-        return None
-
-
-def _get_config_value(
-        webui_manager: WebuiManager,
-        comp_dict: Dict[gr.components.Component, Any],
-        comp_id_suffix: str,
-        default: Any = None,
-) -> Any:
-    """Safely get value from component dictionary using its ID suffix relative to the tab."""
-    # Assumes component ID format is "tab_name.comp_name"
-    tab_name = "browser_use_agent"  # Hardcode or derive if needed
-    comp_id = f"{tab_name}.{comp_id_suffix}"
-    # Need to find the component object first using the ID from the manager
-    try:
-        comp = webui_manager.get_component_by_id(comp_id)
-        return comp_dict.get(comp, default)
-    except KeyError:
-        # Try accessing settings tabs as well
-        for prefix in ["agent_settings", "browser_settings"]:
-            try:
-                comp_id = f"{prefix}.{comp_id_suffix}"
-                comp = webui_manager.get_component_by_id(comp_id)
-                return comp_dict.get(comp, default)
-            except KeyError:
-                continue
-        logger.warning(
-            f"Component with suffix '{comp_id_suffix}' not found in manager for value lookup."
-        )
-        return default
-
-
 def _format_agent_output(model_output: AgentOutput) -> str:
     """Formats AgentOutput for display in the chatbot using JSON."""
     content = ""
@@ -199,25 +134,30 @@ async def _handle_new_step(
 
 def _handle_done(webui_manager: WebuiManager, history: AgentHistoryList):
     """Callback when the agent finishes the task (success or failure)."""
+    # Both totals walk the whole history, so compute them once for the log and the summary
+    duration_seconds = history.total_duration_seconds()
+    input_tokens = history.total_input_tokens()
     logger.info(
-        f"Agent task finished. Duration: {history.total_duration_seconds():.2f}s, Tokens: {history.total_input_tokens()}"
+        f"Agent task finished. Duration: {duration_seconds:.2f}s, Tokens: {input_tokens}"
     )
-    final_summary = "**Task Completed**\n"
-    final_summary += f"- Duration: {history.total_duration_seconds():.2f} seconds\n"
-    final_summary += f"- Total Input Tokens: {history.total_input_tokens()}\n"  # Or total tokens if available
+    summary_parts = [
+        "**Task Completed**\n",
+        f"- Duration: {duration_seconds:.2f} seconds\n",
+        f"- Total Input Tokens: {input_tokens}\n",  # Or total tokens if available
+    ]
 
     final_result = history.final_result()
     if final_result:
-        final_summary += f"- Final Result: {final_result}\n"
+        summary_parts.append(f"- Final Result: {final_result}\n")
 
     errors = history.errors()
     if errors and any(errors):
-        final_summary += f"- **Errors:**\n```\n{errors}\n```\n"
+        summary_parts.append(f"- **Errors:**\n```\n{errors}\n```\n")
     else:
-        final_summary += "- Status: Success\n"
+        summary_parts.append("- Status: Success\n")
 
     webui_manager.bu_chat_history.append(
-        {"role": "assistant", "content": final_summary}
+        {"role": "assistant", "content": "".join(summary_parts)}
     )
 
 
@@ -227,7 +167,7 @@ async def _ask_assistant_callback(
     """Callback triggered by the agent's ask_for_assistant action."""
     logger.info("Agent requires assistance. Waiting for user input.")
 
-    if not hasattr(webui_manager, "_chat_history"):
+    if not hasattr(webui_manager, "bu_chat_history"):
         logger.error("Chat history not found in webui_manager during ask_assistant!")
         return {"response": "Internal Error: Cannot display help request."}
 
@@ -272,6 +212,24 @@ async def _ask_assistant_callback(
 # --- Core Agent Execution Logic --- (Needs access to webui_manager)
 
 
+def _idle_button_updates(webui_manager: WebuiManager) -> Dict[Component, Any]:
+    """Button updates for the idle state (no task running); a fresh dict since Gradio mutates updates."""
+    return {
+        webui_manager.get_component_by_id("browser_use_agent.run_button"): gr.update(
+            value="▶️ Submit Task", interactive=True
+        ),
+        webui_manager.get_component_by_id("browser_use_agent.stop_button"): gr.update(
+            value="⏹️ Stop", interactive=False
+        ),
+        webui_manager.get_component_by_id(
+            "browser_use_agent.pause_resume_button"
+        ): gr.update(value="⏸️ Pause", interactive=False),
+        webui_manager.get_component_by_id("browser_use_agent.clear_button"): gr.update(
+            interactive=True
+        ),
+    }
+
+
 async def run_agent_task(
         webui_manager: WebuiManager, components: Dict[gr.components.Component, Any]
 ) -> AsyncGenerator[Dict[gr.components.Component, Any], None]:
@@ -306,6 +264,23 @@ async def run_agent_task(
         yield {run_button_comp: gr.update(interactive=True)}
         return
 
+    # Resolve all tab values in one pass over the registered components
+    agent_settings = webui_manager.get_tab_values("agent_settings", components)
+
+    def get_setting(key, default=None):
+        return agent_settings.get(key, default)
+
+    # Validate the MCP config before any state change, so a bad config leaves the task in the input box.
+    # Only parsed when a controller is created: the MCP config is consumed once per controller
+    mcp_server_config = None
+    if not webui_manager.bu_controller:
+        try:
+            mcp_server_config = parse_mcp_server_config(get_setting("mcp_server_config"))
+        except ValueError as e:
+            gr.Warning(f"Invalid MCP server config: {e}")
+            yield {run_button_comp: gr.update(interactive=True)}
+            return
+
     # Set running state indirectly via _current_task
     webui_manager.bu_chat_history.append({"role": "user", "content": task})
 
@@ -323,11 +298,6 @@ async def run_agent_task(
     }
 
     # --- Agent Settings ---
-    # Access settings values via components dict, getting IDs from webui_manager
-    def get_setting(key, default=None):
-        comp = webui_manager.id_to_component.get(f"agent_settings.{key}")
-        return components.get(comp, default) if comp else default
-
     override_system_prompt = get_setting("override_system_prompt") or None
     extend_system_prompt = get_setting("extend_system_prompt") or None
     llm_provider_name = get_setting(
@@ -344,41 +314,12 @@ async def run_agent_task(
     max_input_tokens = get_setting("max_input_tokens", 128000)
     tool_calling_str = get_setting("tool_calling_method", "auto")
     tool_calling_method = tool_calling_str if tool_calling_str != "None" else None
-    mcp_server_config_comp = webui_manager.id_to_component.get(
-        "agent_settings.mcp_server_config"
-    )
-    mcp_server_config_str = (
-        components.get(mcp_server_config_comp) if mcp_server_config_comp else None
-    )
-    mcp_server_config = (
-        json.loads(mcp_server_config_str) if mcp_server_config_str else None
-    )
-
-    # Planner LLM Settings (Optional)
-    planner_llm_provider_name = get_setting("planner_llm_provider") or None
-    planner_llm = None
-    planner_use_vision = False
-    if planner_llm_provider_name:
-        planner_llm_model_name = get_setting("planner_llm_model_name")
-        planner_llm_temperature = get_setting("planner_llm_temperature", 0.6)
-        planner_ollama_num_ctx = get_setting("planner_ollama_num_ctx", 16000)
-        planner_llm_base_url = get_setting("planner_llm_base_url") or None
-        planner_llm_api_key = get_setting("planner_llm_api_key") or None
-        planner_use_vision = get_setting("planner_use_vision", False)
-
-        planner_llm = await _initialize_llm(
-            planner_llm_provider_name,
-            planner_llm_model_name,
-            planner_llm_temperature,
-            planner_llm_base_url,
-            planner_llm_api_key,
-            planner_ollama_num_ctx if planner_llm_provider_name == "ollama" else None,
-        )
 
     # --- Browser Settings ---
+    browser_settings = webui_manager.get_tab_values("browser_settings", components)
+
     def get_browser_setting(key, default=None):
-        comp = webui_manager.id_to_component.get(f"browser_settings.{key}")
-        return components.get(comp, default) if comp else default
+        return browser_settings.get(key, default)
 
     browser_binary_path = get_browser_setting("browser_binary_path") or None
     browser_user_data_dir = get_browser_setting("browser_user_data_dir") or None
@@ -402,7 +343,7 @@ async def run_agent_task(
     stream_vw = 70
     stream_vh = int(70 * window_h // window_w)
 
-    os.makedirs(save_agent_history_path, exist_ok=True)
+    # save_agent_history_path is created with the per-task history dir below
     if save_recording_path:
         os.makedirs(save_recording_path, exist_ok=True)
     if save_trace_path:
@@ -410,16 +351,6 @@ async def run_agent_task(
     if save_download_path:
         os.makedirs(save_download_path, exist_ok=True)
 
-    # --- 2. Initialize LLM ---
-    main_llm = await _initialize_llm(
-        llm_provider_name,
-        llm_model_name,
-        llm_temperature,
-        llm_base_url,
-        llm_api_key,
-        ollama_num_ctx if llm_provider_name == "ollama" else None,
-    )
-
     # Pass the webui_manager instance to the callback when wrapping it
     async def ask_callback_wrapper(
             query: str, browser_context: BrowserContext
@@ -526,6 +457,38 @@ async def run_agent_task(
                 raise ValueError(
                     "Browser or Context not initialized, cannot create agent."
                 )
+
+            # LLMs are only needed to build a new agent; a reused agent keeps its own
+            main_llm = await llm_provider.initialize_llm(
+                llm_provider_name,
+                llm_model_name,
+                llm_temperature,
+                llm_base_url,
+                llm_api_key,
+                ollama_num_ctx if llm_provider_name == "ollama" else None,
+            )
+
+            # Planner LLM Settings (Optional)
+            planner_llm_provider_name = get_setting("planner_llm_provider") or None
+            planner_llm = None
+            planner_use_vision = False
+            if planner_llm_provider_name:
+                planner_llm_model_name = get_setting("planner_llm_model_name")
+                planner_llm_temperature = get_setting("planner_llm_temperature", 0.6)
+                planner_ollama_num_ctx = get_setting("planner_ollama_num_ctx", 16000)
+                planner_llm_base_url = get_setting("planner_llm_base_url") or None
+                planner_llm_api_key = get_setting("planner_llm_api_key") or None
+                planner_use_vision = get_setting("planner_use_vision", False)
+
+                planner_llm = await llm_provider.initialize_llm(
+                    planner_llm_provider_name,
+                    planner_llm_model_name,
+                    planner_llm_temperature,
+                    planner_llm_base_url,
+                    planner_llm_api_key,
+                    planner_ollama_num_ctx if planner_llm_provider_name == "ollama" else None,
+                )
+
             webui_manager.bu_agent = BrowserUseAgent(
                 task=task,
                 llm=main_llm,
@@ -560,6 +523,8 @@ async def run_agent_task(
         webui_manager.bu_current_task = agent_task  # Store the task
 
         last_chat_len = len(webui_manager.bu_chat_history)
+        # Last HTML sent to the browser view ("" = hidden), to skip re-sending unchanged frames
+        last_browser_view: Optional[str] = None
         while not agent_task.done():
             is_paused = webui_manager.bu_agent.state.paused
             is_stopped = webui_manager.bu_agent.state.stopped
@@ -667,22 +632,22 @@ async def run_agent_task(
                     )
                     if screenshot_b64:
                         html_content = f'<img src="data:image/jpeg;base64,{screenshot_b64}" style="width:{stream_vw}vw; height:{stream_vh}vh ; border:1px solid #ccc;">'
-                        update_dict[browser_view_comp] = gr.update(
-                            value=html_content, visible=True
-                        )
                     else:
                         html_content = f"<h1 style='width:{stream_vw}vw; height:{stream_vh}vh'>Waiting for browser session...</h1>"
-                        update_dict[browser_view_comp] = gr.update(
-                            value=html_content, visible=True
-                        )
                 except Exception as e:
                     logger.debug(f"Failed to capture screenshot: {e}")
+                    html_content = "<div style='...'>Error loading view...</div>"
+            else:
+                html_content = ""
+            # An idle page yields the same frame; don't ship the base64 image again
+            if html_content != last_browser_view:
+                if html_content:
                     update_dict[browser_view_comp] = gr.update(
-                        value="<div style='...'>Error loading view...</div>",
-                        visible=True,
+                        value=html_content, visible=True
                     )
-            else:
-                update_dict[browser_view_comp] = gr.update(visible=False)
+                else:
+                    update_dict[browser_view_comp] = gr.update(visible=False)
+                last_browser_view = html_content
 
             # Yield accumulated updates
             if update_dict:
@@ -704,7 +669,8 @@ async def run_agent_task(
             logger.info("Agent task completed processing.")
 
             logger.info(f"Explicitly saving agent history to: {history_file}")
-            webui_manager.bu_agent.save_history(history_file)
+            # Serializing the full history (screenshots included) is blocking file I/O
+            await asyncio.to_thread(webui_manager.bu_agent.save_history, history_file)
 
             if os.path.exists(history_file):
                 final_update[history_file_comp] = gr.File(value=history_file)
@@ -762,12 +728,7 @@ async def run_agent_task(
                         interactive=True,
                         placeholder="Enter your next task...",
                     ),
-                    run_button_comp: gr.update(value="▶️ Submit Task", interactive=True),
-                    stop_button_comp: gr.update(value="⏹️ Stop", interactive=False),
-                    pause_resume_button_comp: gr.update(
-                        value="⏸️ Pause", interactive=False
-                    ),
-                    clear_button_comp: gr.update(interactive=True),
+                    **_idle_button_updates(webui_manager),
                     # Ensure final chat history is shown
                     chatbot_comp: gr.update(value=webui_manager.bu_chat_history),
                 }
@@ -782,10 +743,7 @@ async def run_agent_task(
             user_input_comp: gr.update(
                 interactive=True, placeholder="Error during setup. Enter task..."
             ),
-            run_button_comp: gr.update(value="▶️ Submit Task", interactive=True),
-            stop_button_comp: gr.update(value="⏹️ Stop", interactive=False),
-            pause_resume_button_comp: gr.update(value="⏸️ Pause", interactive=False),
-            clear_button_comp: gr.update(interactive=True),
+            **_idle_button_updates(webui_manager),
             chatbot_comp: gr.update(
                 value=webui_manager.bu_chat_history
                       + [{"role": "assistant", "content": f"**Setup Error:** {e}"}]
@@ -860,20 +818,7 @@ async def handle_stop(webui_manager: WebuiManager):
     else:
         logger.warning("Stop clicked but agent is not running or task is already done.")
         # Reset UI just in case it's stuck
-        return {
-            webui_manager.get_component_by_id(
-                "browser_use_agent.run_button"
-            ): gr.update(interactive=True),
-            webui_manager.get_component_by_id(
-                "browser_use_agent.stop_button"
-            ): gr.update(interactive=False),
-            webui_manager.get_component_by_id(
-                "browser_use_agent.pause_resume_button"
-            ): gr.update(interactive=False),
-            webui_manager.get_component_by_id(
-                "browser_use_agent.clear_button"
-            ): gr.update(interactive=True),
-        }
+        return _idle_button_updates(webui_manager)
 
 
 async def handle_pause_resume(webui_manager: WebuiManager):
@@ -954,18 +899,7 @@ async def handle_clear(webui_manager: WebuiManager):
         webui_manager.get_component_by_id("browser_use_agent.browser_view"): gr.update(
             value="<div style='...'>Browser Cleared</div>"
         ),
-        webui_manager.get_component_by_id("browser_use_agent.run_button"): gr.update(
-            value="▶️ Submit Task", interactive=True
-        ),
-        webui_manager.get_component_by_id("browser_use_agent.stop_button"): gr.update(
-            interactive=False
-        ),
-        webui_manager.get_component_by_id(
-            "browser_use_agent.pause_resume_button"
-        ): gr.update(value="⏸️ Pause", interactive=False),
-        webui_manager.get_component_by_id("browser_use_agent.clear_button"): gr.update(
-            interactive=True
-        ),
+        **_idle_button_updates(webui_manager),
     }
 
 
@@ -3,50 +3,24 @@ from gradio.components import Component
 from functools import partial
 
 from src.webui.webui_manager import WebuiManager
-from src.utils import config
+from src.utils import config, llm_provider
 import logging
 import os
 from typing import Any, Dict, AsyncGenerator, Optional, Tuple, Union
 import asyncio
 import json
-from src.agent.deep_research.deep_research_agent import DeepResearchAgent
-from src.utils import llm_provider
+from src.utils.mcp_client import parse_mcp_server_config
 
 logger = logging.getLogger(__name__)
 
 
-async def _initialize_llm(provider: Optional[str], model_name: Optional[str], temperature: float,
-                          base_url: Optional[str], api_key: Optional[str], num_ctx: Optional[int] = None):
-    """Initializes the LLM based on settings. Returns None if provider/model is missing."""
-    if not provider or not model_name:
-        logger.info("LLM Provider or Model Name not specified, LLM will be None.")
-        return None
-    try:
-        logger.info(f"Initializing LLM: Provider={provider}, Model={model_name}, Temp={temperature}")
-        # Use your actual LLM provider logic here
-        llm = llm_provider.get_llm_model(
-            provider=provider,
-            model_name=model_name,
-            temperature=temperature,
-            base_url=base_url or None,
-            api_key=api_key or None,
-            num_ctx=num_ctx if provider == "ollama" else None
-        )
-        return llm
-    except Exception as e:
-        logger.error(f"Failed to initialize LLM: {e}", exc_info=True)
-        gr.Warning(
-            f"Failed to initialize LLM '{model_name}' for provider '{provider}'. Please check settings. Error: {e}")
-        return None
-
-
 def _read_file_safe(file_path: str) -> Optional[str]:
     """Safely read a file, returning None if it doesn't exist or on error."""
-    if not os.path.exists(file_path):
-        return None
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             return f.read()
+    except FileNotFoundError:
+        return None
     except Exception as e:
         logger.error(f"Error reading file {file_path}: {e}")
         return None
@@ -82,13 +56,19 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
         normalized_base_save_dir = os.path.abspath(safe_root_dir)
     base_save_dir = normalized_base_save_dir
     mcp_server_config_str = components.get(mcp_server_config_comp)
-    mcp_config = json.loads(mcp_server_config_str) if mcp_server_config_str else None
 
     if not task_topic:
         gr.Warning("Please enter a research task.")
         yield {start_button_comp: gr.update(interactive=True)}  # Re-enable start button
         return
 
+    try:
+        mcp_config = parse_mcp_server_config(mcp_server_config_str)
+    except ValueError as e:
+        gr.Warning(f"Invalid MCP server config: {e}")
+        yield {start_button_comp: gr.update(interactive=True)}
+        return
+
     # Store base save dir for stop handler
     webui_manager.dr_save_dir = base_save_dir
     os.makedirs(base_save_dir, exist_ok=True)
@@ -113,26 +93,15 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
     last_plan_mtime = 0
 
     try:
-        # --- 3. Get LLM and Browser Config from other tabs ---
-        # Access settings values via components dict, getting IDs from webui_manager
+        # --- 3. Get Browser Config from other tabs ---
+        # Resolve each settings tab's values in one pass over the registered components
+        tab_values = {
+            tab: webui_manager.get_tab_values(tab, components)
+            for tab in ("agent_settings", "browser_settings")
+        }
+
         def get_setting(tab: str, key: str, default: Any = None):
-            comp = webui_manager.id_to_component.get(f"{tab}.{key}")
-            return components.get(comp, default) if comp else default
-
-        # LLM Config (from agent_settings tab)
-        llm_provider_name = get_setting("agent_settings", "llm_provider")
-        llm_model_name = get_setting("agent_settings", "llm_model_name")
-        llm_temperature = max(get_setting("agent_settings", "llm_temperature", 0.5), 0.5)
-        llm_base_url = get_setting("agent_settings", "llm_base_url")
-        llm_api_key = get_setting("agent_settings", "llm_api_key")
-        ollama_num_ctx = get_setting("agent_settings", "ollama_num_ctx")
-
-        llm = await _initialize_llm(
-            llm_provider_name, llm_model_name, llm_temperature, llm_base_url, llm_api_key,
-            ollama_num_ctx if llm_provider_name == "ollama" else None
-        )
-        if not llm:
-            raise ValueError("LLM Initialization failed. Please check Agent Settings.")
+            return tab_values[tab].get(key, default)
 
         # Browser Config (from browser_settings tab)
         # Note: DeepResearchAgent constructor takes a dict, not full Browser/Context objects
@@ -143,17 +112,41 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             "user_data_dir": get_setting("browser_settings", "browser_user_data_dir"),
             "window_width": int(get_setting("browser_settings", "window_w", 1280)),
             "window_height": int(get_setting("browser_settings", "window_h", 1100)),
+            "use_own_browser": get_setting("browser_settings", "use_own_browser", False),
+            "keep_browser_open": get_setting("browser_settings", "keep_browser_open", False),
             # Add other relevant fields if DeepResearchAgent accepts them
         }
 
         # --- 4. Initialize or Get Agent ---
+        # The LLM is only needed to build a new agent; an existing agent keeps its own
         if not webui_manager.dr_agent:
+            # LLM Config (from agent_settings tab)
+            llm_provider_name = get_setting("agent_settings", "llm_provider")
+            llm_model_name = get_setting("agent_settings", "llm_model_name")
+            llm_temperature = max(get_setting("agent_settings", "llm_temperature", 0.5), 0.5)
+            llm_base_url = get_setting("agent_settings", "llm_base_url")
+            llm_api_key = get_setting("agent_settings", "llm_api_key")
+            ollama_num_ctx = get_setting("agent_settings", "ollama_num_ctx")
+
+            llm = await llm_provider.initialize_llm(
+                llm_provider_name, llm_model_name, llm_temperature, llm_base_url, llm_api_key,
+                ollama_num_ctx if llm_provider_name == "ollama" else None
+            )
+            if not llm:
+                raise ValueError("LLM Initialization failed. Please check Agent Settings.")
+
+            # Imported lazily: pulls in langgraph and the search tooling, only needed once a run starts
+            from src.agent.deep_research.deep_research_agent import DeepResearchAgent
+
             webui_manager.dr_agent = DeepResearchAgent(
                 llm=llm,
                 browser_config=browser_config_dict,
                 mcp_server_config=mcp_config
             )
             logger.info("DeepResearchAgent initialized.")
+        else:
+            # The agent outlives a run; pick up browser settings changed since it was created
+            webui_manager.dr_agent.browser_config = browser_config_dict
 
         # --- 5. Start Agent Run ---
         agent_run_coro = webui_manager.dr_agent.run(
@@ -194,9 +187,9 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             logger.warning("Cannot monitor plan file: Task ID unknown.")
             plan_file_path = None
         last_plan_content = None
+        # The task ID doesn't change while monitoring, so it only goes out with the first update
+        update_dict = {resume_task_id_comp: gr.update(value=running_task_id)}
         while not agent_task.done():
-            update_dict = {}
-            update_dict[resume_task_id_comp] = gr.update(value=running_task_id)
             agent_stopped = getattr(webui_manager.dr_agent, 'stopped', False)
             if agent_stopped:
                 logger.info("Stop signal detected from agent state.")
@@ -205,18 +198,22 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             # Check and update research plan display
             if plan_file_path:
                 try:
-                    current_mtime = os.path.getmtime(plan_file_path) if os.path.exists(plan_file_path) else 0
+                    try:
+                        current_mtime = os.stat(plan_file_path).st_mtime
+                    except FileNotFoundError:
+                        current_mtime = 0
                     if current_mtime > last_plan_mtime:
                         logger.info(f"Detected change in {plan_file_path}")
-                        plan_content = _read_file_safe(plan_file_path)
-                        if last_plan_content is None or (
-                                plan_content is not None and plan_content != last_plan_content):
-                            update_dict[markdown_display_comp] = gr.update(value=plan_content)
-                            last_plan_content = plan_content
-                            last_plan_mtime = current_mtime
-                        elif plan_content is None:
+                        plan_content = await asyncio.to_thread(_read_file_safe, plan_file_path)
+                        if plan_content is None:
                             # File might have been deleted or became unreadable
                             last_plan_mtime = 0  # Reset to force re-read attempt later
+                        else:
+                            if plan_content != last_plan_content:
+                                update_dict[markdown_display_comp] = gr.update(value=plan_content)
+                                last_plan_content = plan_content
+                            # Also when unchanged, so a rewrite with equal content isn't re-read every tick
+                            last_plan_mtime = current_mtime
                 except Exception as e:
                     logger.warning(f"Error checking/reading plan file {plan_file_path}: {e}")
                     # Avoid continuous logging for the same error
@@ -225,6 +222,7 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             # Yield updates if any
             if update_dict:
                 yield update_dict
+                update_dict = {}
 
             await asyncio.sleep(1.0)  # Check file changes every second
 
@@ -242,9 +240,19 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             logger.info(f"Task ID confirmed from result: {running_task_id}")
 
         final_ui_update = {}
-        if report_file_path and os.path.exists(report_file_path):
+        # The agent returns the same report it wrote to report.md; only read the file as a fallback
+        final_report = ((final_result_dict or {}).get("final_state") or {}).get("final_report")
+        report_file_exists = bool(report_file_path) and os.path.exists(report_file_path)
+        if final_report:
+            logger.info("Using final report from agent result.")
+            final_ui_update[markdown_display_comp] = gr.update(value=final_report)
+            if report_file_exists:
+                final_ui_update[markdown_download_comp] = gr.File(value=report_file_path,
+                                                                  label=f"Report ({running_task_id}.md)",
+                                                                  interactive=True)
+        elif report_file_exists:
             logger.info(f"Loading final report from: {report_file_path}")
-            report_content = _read_file_safe(report_file_path)
+            report_content = await asyncio.to_thread(_read_file_safe, report_file_path)
             if report_content:
                 final_ui_update[markdown_display_comp] = gr.update(value=report_content)
                 final_ui_update[markdown_download_comp] = gr.File(value=report_file_path,
@@ -325,7 +333,7 @@ async def stop_deep_research(webui_manager: WebuiManager) -> Dict[Component, Any
             report_file_path = os.path.join(base_save_dir, str(task_id), "report.md")
 
         if report_file_path and os.path.exists(report_file_path):
-            report_content = _read_file_safe(report_file_path)
+            report_content = await asyncio.to_thread(_read_file_safe, report_file_path)
             if report_content:
                 final_update[markdown_display_comp] = gr.update(
                     value=report_content + "\n\n---\n*Research stopped by user.*")
@@ -348,7 +356,7 @@ async def stop_deep_research(webui_manager: WebuiManager) -> Dict[Component, Any
             stop_button_comp: gr.update(interactive=False),
             webui_manager.get_component_by_id("deep_research_agent.research_task"): gr.update(interactive=True),
             webui_manager.get_component_by_id("deep_research_agent.resume_task_id"): gr.update(interactive=True),
-            webui_manager.get_component_by_id("deep_research_agent.max_iteration"): gr.update(interactive=True),
+            webui_manager.get_component_by_id("deep_research_agent.parallel_num"): gr.update(interactive=True),
             webui_manager.get_component_by_id("deep_research_agent.max_query"): gr.update(interactive=True),
         }
 
@@ -377,7 +385,6 @@ def create_deep_research_agent_tab(webui_manager: WebuiManager):
     """
     Creates a deep research agent tab
     """
-    input_components = set(webui_manager.get_components())
     tab_components = {}
 
     with gr.Group():
@@ -9,7 +9,6 @@ def create_load_save_config_tab(webui_manager: WebuiManager):
     """
     Creates a load and save config tab.
     """
-    input_components = set(webui_manager.get_components())
     tab_components = {}
 
     config_file = gr.File(
@@ -35,16 +34,17 @@ def create_load_save_config_tab(webui_manager: WebuiManager):
     ))
 
     webui_manager.add_components("load_save_config", tab_components)
+    all_components = webui_manager.get_components()
 
     save_config_button.click(
         fn=webui_manager.save_config,
-        inputs=set(webui_manager.get_components()),
+        inputs=set(all_components),
         outputs=[config_status]
     )
 
     load_config_button.click(
         fn=webui_manager.load_config,
         inputs=[config_file],
-        outputs=webui_manager.get_components(),
+        outputs=all_components,
     )
 
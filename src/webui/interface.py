@@ -7,15 +7,16 @@ from src.webui.components.browser_use_agent_tab import create_browser_use_agent_
 from src.webui.components.deep_research_agent_tab import create_deep_research_agent_tab
 from src.webui.components.load_save_config_tab import create_load_save_config_tab
 
+# Theme classes; only the selected one is instantiated in create_ui
 theme_map = {
-    "Default": gr.themes.Default(),
-    "Soft": gr.themes.Soft(),
-    "Monochrome": gr.themes.Monochrome(),
-    "Glass": gr.themes.Glass(),
-    "Origin": gr.themes.Origin(),
-    "Citrus": gr.themes.Citrus(),
-    "Ocean": gr.themes.Ocean(),
-    "Base": gr.themes.Base()
+    "Default": gr.themes.Default,
+    "Soft": gr.themes.Soft,
+    "Monochrome": gr.themes.Monochrome,
+    "Glass": gr.themes.Glass,
+    "Origin": gr.themes.Origin,
+    "Citrus": gr.themes.Citrus,
+    "Ocean": gr.themes.Ocean,
+    "Base": gr.themes.Base
 }
 
 
@@ -57,7 +58,7 @@ def create_ui(theme_name="Ocean"):
     ui_manager = WebuiManager()
 
     with gr.Blocks(
-            title="Browser Use WebUI", theme=theme_map[theme_name], css=css, js=js_func,
+            title="Browser Use WebUI", theme=theme_map[theme_name](), css=css, js=js_func,
     ) as demo:
         with gr.Row():
             gr.Markdown(
@@ -4,19 +4,21 @@ from typing import TYPE_CHECKING
 import os
 import gradio as gr
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Any, Optional, Dict, List
 import uuid
 import asyncio
 import time
 
 from gradio.components import Component
-from browser_use.browser.browser import Browser
-from browser_use.browser.context import BrowserContext
-from browser_use.agent.service import Agent
-from src.browser.custom_browser import CustomBrowser
-from src.browser.custom_context import CustomBrowserContext
-from src.controller.custom_controller import CustomController
-from src.agent.deep_research.deep_research_agent import DeepResearchAgent
+
+if TYPE_CHECKING:
+    # Only used in attribute annotations; importing them here would pull browser_use,
+    # Playwright and the LangGraph research agent into every module that imports the manager
+    from browser_use.agent.service import Agent
+    from src.browser.custom_browser import CustomBrowser
+    from src.browser.custom_context import CustomBrowserContext
+    from src.controller.custom_controller import CustomController
+    from src.agent.deep_research.deep_research_agent import DeepResearchAgent
 
 
 class WebuiManager:
@@ -31,10 +33,10 @@ class WebuiManager:
         """
         init browser use agent
         """
-        self.bu_agent: Optional[Agent] = None
-        self.bu_browser: Optional[CustomBrowser] = None
-        self.bu_browser_context: Optional[CustomBrowserContext] = None
-        self.bu_controller: Optional[CustomController] = None
+        self.bu_agent: Optional["Agent"] = None
+        self.bu_browser: Optional["CustomBrowser"] = None
+        self.bu_browser_context: Optional["CustomBrowserContext"] = None
+        self.bu_controller: Optional["CustomController"] = None
         self.bu_chat_history: List[Dict[str, Optional[str]]] = []
         self.bu_response_event: Optional[asyncio.Event] = None
         self.bu_user_help_response: Optional[str] = None
@@ -45,7 +47,7 @@ class WebuiManager:
         """
         init deep research agent
         """
-        self.dr_agent: Optional[DeepResearchAgent] = None
+        self.dr_agent: Optional["DeepResearchAgent"] = None
         self.dr_current_task = None
         self.dr_agent_task_id: Optional[str] = None
         self.dr_save_dir: Optional[str] = None
@@ -77,14 +79,26 @@ class WebuiManager:
         """
         return self.component_to_id[comp]
 
+    def get_tab_values(self, tab_name: str, components: Dict["Component", Any]) -> Dict[str, Any]:
+        """
+        Get the values of a tab's components from a Gradio inputs dict, keyed by component name
+        """
+        prefix = f"{tab_name}."
+        prefix_len = len(prefix)
+        return {
+            comp_id[prefix_len:]: components[comp]
+            for comp_id, comp in self.id_to_component.items()
+            if comp_id.startswith(prefix) and comp in components
+        }
+
     def save_config(self, components: Dict["Component", str]) -> None:
         """
         Save config
         """
         cur_settings = {}
         for comp in components:
-            if not isinstance(comp, gr.Button) and not isinstance(comp, gr.File) and str(
-                    getattr(comp, "interactive", True)).lower() != "false":
+            # interactive may be None (Gradio's default), which still counts as interactive
+            if not isinstance(comp, (gr.Button, gr.File)) and getattr(comp, "interactive", True) is not False:
                 comp_id = self.get_id_by_component(comp)
                 cur_settings[comp_id] = components[comp]
 
@@ -103,15 +117,16 @@ class WebuiManager:
 
         update_components = {}
         for comp_id, comp_val in ui_settings.items():
-            if comp_id in self.id_to_component:
-                comp = self.id_to_component[comp_id]
-                if comp.__class__.__name__ == "Chatbot":
-                    update_components[comp] = comp.__class__(value=comp_val, type="messages")
-                else:
-                    update_components[comp] = comp.__class__(value=comp_val)
-                    if comp_id == "agent_settings.planner_llm_provider":
-                        yield update_components  # yield provider, let callback run
-                        time.sleep(0.1)  # wait for Gradio UI callback
+            comp = self.id_to_component.get(comp_id)
+            if comp is None:
+                continue
+            if isinstance(comp, gr.Chatbot):
+                update_components[comp] = comp.__class__(value=comp_val, type="messages")
+            else:
+                update_components[comp] = comp.__class__(value=comp_val)
+                if comp_id == "agent_settings.planner_llm_provider":
+                    yield update_components  # yield provider, let callback run
+                    time.sleep(0.1)  # wait for Gradio UI callback
 
         config_status = self.id_to_component["load_save_config.config_status"]
         update_components.update(